@@ -1,24 +1,32 @@
 import os
 import sys
+import copy
 import json
 import hashlib
 import argparse
+import functools
 import subprocess
+import time
+import types
 from pathlib import Path
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Tuple
 import logging
 from datetime import datetime
-# 添加TextualLogger导入
-
-
-from textual_logger import TextualLoggerManager
-from hashu.utils.hash_process_config import  process_artist_folder, process_duplicates
-from loguru import logger
+# orjson 为可选依赖，未安装时回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 import os
 import sys
 from pathlib import Path
 from datetime import datetime
 
+# 脚本所在目录和默认配置文件路径，只在导入时计算一次
+_MODULE_DIR = Path(__file__).resolve().parent
+_DEFAULT_CONFIG_PATH = _MODULE_DIR / "config.json"
+
 def parse_args():
     """解析命令行参数
     
@@ -34,22 +42,25 @@ def parse_args():
     parser.add_argument('--filter-white', action='store_true', help='启用白图过滤')
     return parser.parse_args()
 
-def setup_logger(app_name="app", project_root=None, console_output=True):
+def setup_logger(app_name="app", project_root=None, console_output=True, enable_file=True):
     """配置 Loguru 日志系统
     
     Args:
         app_name: 应用名称，用于日志目录
         project_root: 项目根目录，默认为当前文件所在目录
         console_output: 是否输出到控制台，默认为True
+        enable_file: 是否写入日志文件，默认为True
         
     Returns:
         tuple: (logger, config_info)
             - logger: 配置好的 logger 实例
             - config_info: 包含日志配置信息的字典
     """
+    from loguru import logger
+    
     # 获取项目根目录
     if project_root is None:
-        project_root = Path(__file__).parent.resolve()
+        project_root = _MODULE_DIR
     
     # 清除默认处理器
     logger.remove()
@@ -62,27 +73,41 @@ def setup_logger(app_name="app", project_root=None, console_output=True):
             format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <blue>{elapsed}</blue> | <level>{level.icon} {level: <8}</level> | <cyan>{name}:{function}:{line}</cyan> - <level>{message}</level>"
         )
     
+    # 不写文件时直接返回，避免创建目录和 enqueue 后台线程
+    if not enable_file:
+        config_info = {
+            'log_file': None,
+        }
+        logger.info(f"日志系统已初始化，应用名称: {app_name}")
+        return logger, config_info
+    
     # 使用 datetime 构建日志路径
-    current_time = datetime.now()
-    date_str = current_time.strftime("%Y-%m-%d")
-    hour_str = current_time.strftime("%H")
-    minute_str = current_time.strftime("%M%S")
+    # 只格式化一次时间，再拆分为日期、小时、分秒三部分
+    date_str, hour_str, minute_str = datetime.now().strftime("%Y-%m-%d %H %M%S").split()
     
     # 构建日志目录和文件路径
     log_dir = os.path.join(project_root, "logs", app_name, date_str, hour_str)
     os.makedirs(log_dir, exist_ok=True)
     log_file = os.path.join(log_dir, f"{minute_str}.log")
     
+    # 轮转、保留和压缩会额外启动清理逻辑，仅在 LOG_ROTATE=1 时启用
+    rotate_options = {}
+    if os.environ.get("LOG_ROTATE") == "1":
+        rotate_options = {
+            'rotation': "10 MB",
+            'retention': "30 days",
+            'compression': "zip",
+        }
+    
     # 添加文件处理器
     logger.add(
         log_file,
         level="DEBUG",
-        rotation="10 MB",
-        retention="30 days",
-        compression="zip",
         encoding="utf-8",
         format="{time:YYYY-MM-DD HH:mm:ss} | {elapsed} | {level.icon} {level: <8} | {name}:{function}:{line} - {message}",
-        enqueue=True,     )
+        enqueue=True,
+        **rotate_options,
+    )
     
     # 创建配置信息字典
     config_info = {
@@ -92,7 +117,12 @@ def setup_logger(app_name="app", project_root=None, console_output=True):
     logger.info(f"日志系统已初始化，应用名称: {app_name}")
     return logger, config_info
 
-logger, config_info = setup_logger(app_name="artfilter", console_output=True)
+# 先解析命令行参数，--help 和参数错误时无需导入 loguru/hashu 等依赖即可退出
+args = parse_args()
+
+# 输出被重定向时不需要日志文件
+_ENABLE_LOG_FILE = sys.stdout.isatty()
+logger, config_info = setup_logger(app_name="artfilter", console_output=True, enable_file=_ENABLE_LOG_FILE)
 
 
 # 加载配置文件
@@ -107,14 +137,18 @@ def load_config(config_path=None):
     """
     # 如果未指定配置文件路径，则使用默认路径
     if config_path is None:
-        config_path = Path(__file__).parent / "config.json"
+        config_path = _DEFAULT_CONFIG_PATH
     else:
         config_path = Path(config_path)
         
     try:
         if config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            if orjson is not None:
+                with open(config_path, 'rb') as f:
+                    config = orjson.loads(f.read())
+            else:
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
             logger.info(f"✅ 已加载配置文件: {config_path}")
             return config
         else:
@@ -125,9 +159,6 @@ def load_config(config_path=None):
         return None
         
 
-# 解析命令行参数
-args = parse_args()
-
 # 加载配置
 CONFIG = load_config(args.config)
 
@@ -152,14 +183,40 @@ if args.filter_white:
     CONFIG["default_params"]["filter_white_enabled"] = True
     logger.info(f"✅ 使用命令行参数启用白图过滤")
 
-DEFAULT_PARAMS = CONFIG["default_params"]
+# 冻结默认参数，避免与 CONFIG 共享的嵌套字典被意外修改；需要可变副本时在 main 中深拷贝
+DEFAULT_PARAMS = types.MappingProxyType({
+    k: types.MappingProxyType(v) if isinstance(v, dict) else v
+    for k, v in CONFIG["default_params"].items()
+})
 TEXTUAL_LAYOUT = CONFIG["textual_layout"]
 WORKER_COUNT = CONFIG["worker_count"]
 FORCE_UPDATE = CONFIG["force_update"]
 
 def init_TextualLogger():
+    from textual_logger import TextualLoggerManager
     TextualLoggerManager.set_layout(TEXTUAL_LAYOUT, config_info['log_file'])
 
+# 视为压缩包的文件后缀
+_ARCHIVE_SUFFIXES = frozenset({'.zip', '.7z', '.rar'})
+
+def is_artist_folder(name: str) -> bool:
+    """判断名称是否为画师文件夹（包含成对的[]标记，且[在]之前）"""
+    i = name.find('[')
+    return i != -1 and name.find(']', i + 1) != -1
+
+@functools.lru_cache(maxsize=512)
+def _scan_for_artist_folders(base_path_str: str) -> Tuple[Path, ...]:
+    """扫描目录下的画师文件夹，按目录缓存结果，多个输入路径共用同一目录时只扫描一次
+    
+    Args:
+        base_path_str: 要扫描的目录路径字符串
+        
+    Returns:
+        Tuple[Path, ...]: 画师文件夹路径
+    """
+    with os.scandir(base_path_str) as it:
+        return tuple(Path(e.path) for e in it if is_artist_folder(e.name) and e.is_dir(follow_symlinks=False))
+
 def get_artist_folder_from_path(path: Path) -> Optional[Path]:
     """从给定路径获取画师文件夹
     
@@ -169,15 +226,11 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
     Returns:
         Optional[Path]: 画师文件夹路径
     """
-    def is_artist_folder(p: Path) -> bool:
-        """判断是否为画师文件夹"""
-        return '[' in p.name and ']' in p.name
-    
     try:
         path = Path(path).resolve()
         
         # 如果是压缩包，使用其所在目录
-        if path.is_file() and path.suffix.lower() in ['.zip', '.7z', '.rar']:
+        if path.is_file() and path.suffix.lower() in _ARCHIVE_SUFFIXES:
             base_path = path.parent
         else:
             base_path = path
@@ -185,7 +238,7 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
         # 向上查找画师文件夹
         current_path = base_path
         while current_path != current_path.parent:
-            if is_artist_folder(current_path):
+            if is_artist_folder(current_path.name):
                 if current_path.exists():
                     logging.info(f'✅ 找到画师文件夹: {current_path}')
                     confirm = input('是否使用该画师文件夹？(Y/n/输入新路径): ').strip()
@@ -195,7 +248,7 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
                         break  # 继续搜索当前目录下的其他画师文件夹
                     elif os.path.exists(confirm):
                         new_path = Path(confirm)
-                        if is_artist_folder(new_path):
+                        if is_artist_folder(new_path.name):
                             return new_path
                         else:
                             logging.info('❌ 输入的路径不是画师文件夹（需要包含[]标记）')
@@ -206,10 +259,7 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
             current_path = current_path.parent
         
         # 如果向上查找没有找到或用户拒绝了，则搜索当前目录下的画师文件夹
-        artist_folders = []
-        for entry in base_path.iterdir():
-            if entry.is_dir() and is_artist_folder(entry):
-                artist_folders.append(entry)
+        artist_folders = list(_scan_for_artist_folders(str(base_path)))
                     
         if not artist_folders:
             logging.info(f'❌ 在路径 {base_path} 下未找到画师文件夹')
@@ -224,7 +274,7 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
                 return None
             elif os.path.exists(confirm):
                 new_path = Path(confirm)
-                if is_artist_folder(new_path):
+                if is_artist_folder(new_path.name):
                     return new_path
                 else:
                     logging.info('❌ 输入的路径不是画师文件夹（需要包含[]标记）')
@@ -248,7 +298,7 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
             # 如果输入的是路径
             if os.path.exists(choice):
                 new_path = Path(choice)
-                if is_artist_folder(new_path):
+                if is_artist_folder(new_path.name):
                     return new_path
                 else:
                     logging.info('❌ 输入的路径不是画师文件夹（需要包含[]标记）')
@@ -267,7 +317,7 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
                         continue
                     elif os.path.exists(confirm):
                         new_path = Path(confirm)
-                        if is_artist_folder(new_path):
+                        if is_artist_folder(new_path.name):
                             return new_path
                         else:
                             logging.info('❌ 输入的路径不是画师文件夹（需要包含[]标记）')
@@ -295,6 +345,8 @@ def process_single_path(path: Path, workers: int = 4, force_update: bool = False
     Returns:
         bool: 是否处理成功
     """
+    from hashu.utils.hash_process_config import process_artist_folder, process_duplicates
+    
     try:
         logging.info(f"[#process_log]\n🔄 处理路径: {path}")
         
@@ -323,44 +375,42 @@ def process_single_path(path: Path, workers: int = 4, force_update: bool = False
         logging.info(f"[#process_log]❌ 处理路径时出错: {path}: {e}")
         return False
 
-def find_artist_folders_for_path(path: Path) -> List[Path]:
+def find_artist_folders_for_path(path: Path, resolved: bool = False) -> List[Path]:
     """查找给定路径可能对应的画师文件夹列表
     
     Args:
         path: 输入路径
+        resolved: 路径是否已经 resolve 过，为True时跳过 resolve
         
     Returns:
         List[Path]: 可能的画师文件夹列表
     """
-    def is_artist_folder(p: Path) -> bool:
-        """判断是否为画师文件夹"""
-        return '[' in p.name and ']' in p.name
-    
     try:
-        path = Path(path).resolve()
+        if not resolved:
+            path = Path(path).resolve()
         artist_folders = []
         
         # 如果是压缩包，使用其所在目录
-        if path.is_file() and path.suffix.lower() in ['.zip', '.7z', '.rar']:
+        if path.is_file() and path.suffix.lower() in _ARCHIVE_SUFFIXES:
             base_path = path.parent
         else:
             base_path = path
             
-        # 向上查找画师文件夹
-        current_path = base_path
-        while current_path != current_path.parent:
-            if is_artist_folder(current_path) and current_path.exists():
-                artist_folders.append(current_path)
-            current_path = current_path.parent
+        # 向上查找画师文件夹：只对路径组件做字符串判断，命中时才构造 Path（parts[0] 为根目录，跳过）
+        parts = base_path.parts
+        for i in range(len(parts), 1, -1):
+            if is_artist_folder(parts[i - 1]):
+                candidate = Path(*parts[:i])
+                if candidate.exists():
+                    artist_folders.append(candidate)
         
         # 搜索当前目录下的画师文件夹
-        for entry in base_path.iterdir():
-            if entry.is_dir() and is_artist_folder(entry):
-                artist_folders.append(entry)
+        artist_folders.extend(_scan_for_artist_folders(str(base_path)))
                 
         return artist_folders
         
-    except Exception as e:
+    except OSError as e:
+        # 只处理文件系统错误（路径不存在、无权限等），其他异常属于程序错误，直接抛出
         print(f'❌ 查找画师文件夹时出错: {e}')
         return []
 
@@ -376,13 +426,22 @@ def batch_get_artist_folders(paths: List[str]) -> dict:
     path_to_folders = {}
     path_to_selected = {}
     
-    # 首先收集所有路径可能的画师文件夹
+    # 首先收集所有路径可能的画师文件夹；stat 类操作会释放 GIL，网络盘上用线程池并发检查
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        existence = dict(zip(paths, executor.map(os.path.exists, paths)))
+        existing_paths = [p for p in paths if existence[p]]
+        # 每个路径只 resolve 一次，后续直接传入已解析的路径
+        resolved = dict(zip(existing_paths, executor.map(lambda p: Path(p).resolve(), existing_paths)))
+        found = dict(zip(existing_paths, executor.map(
+            lambda p: find_artist_folders_for_path(resolved[p], resolved=True), existing_paths)))
+    
+    # 按输入顺序输出结果
     for path in paths:
-        if not os.path.exists(path):
+        if not existence[path]:
             logging.info(f"❌ 路径不存在: {path}")
             continue
             
-        folders = find_artist_folders_for_path(Path(path))
+        folders = found[path]
         if not folders:
             logging.info(f"❌ 未找到画师文件夹: {path}")
             continue
@@ -393,13 +452,16 @@ def batch_get_artist_folders(paths: List[str]) -> dict:
     
     # 显示所有路径和对应的画师文件夹
     while True:
-        print("\n当前所有路径及其对应的画师文件夹:")
+        # 先拼接全部输出再一次性写入，避免逐行 print
+        lines = ["\n当前所有路径及其对应的画师文件夹:"]
         for i, path in enumerate(path_to_folders.keys(), 1):
-            print(f"\n{i}. 路径: {path}")
-            print(f"   当前选择的画师文件夹: {path_to_selected[path]}")
-            print("   可选的画师文件夹:")
+            lines.append(f"\n{i}. 路径: {path}")
+            lines.append(f"   当前选择的画师文件夹: {path_to_selected[path]}")
+            lines.append("   可选的画师文件夹:")
             for j, folder in enumerate(path_to_folders[path], 1):
-                print(f"      {j}. {folder}")
+                lines.append(f"      {j}. {folder}")
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
         
         # 让用户选择是否需要修改
 
@@ -427,16 +489,65 @@ def batch_get_artist_folders(paths: List[str]) -> dict:
     
     return path_to_selected
 
+def _bar(progress: int) -> str:
+    """构建进度条字符串
+    
+    Args:
+        progress: 进度百分比
+        
+    Returns:
+        str: 进度条字符串
+    """
+    return '=' * (progress // 5)
+
+def _one_job(artist_folder: Path, paths: List[str], workers: int, force_update: bool, params: dict) -> int:
+    """处理一个画师文件夹：只生成一次哈希文件，再依次处理对应的各个路径
+    
+    Args:
+        artist_folder: 画师文件夹路径
+        paths: 对应该画师文件夹的输入路径列表
+        workers: 线程数
+        force_update: 是否强制更新
+        params: 参数字典，包含处理参数
+        
+    Returns:
+        int: 处理成功的路径数
+    """
+    from hashu.utils.hash_process_config import process_artist_folder, process_duplicates
+    
+    # 处理画师文件夹，生成哈希文件
+    hash_file = process_artist_folder(artist_folder, workers, force_update)
+    if not hash_file:
+        return 0
+        
+    # 处理重复文件
+    success_count = 0
+    for path in paths:
+        try:
+            process_duplicates(hash_file, [str(path)], params, workers)
+            success_count += 1
+        except Exception as e:
+            logging.info(f"[#process_log]❌ 处理路径时出错: {path}: {e}")
+    return success_count
+
 def main():
     """主函数"""
     # 获取路径列表
     print("请输入要处理的路径（每行一个，输入空行结束）:")
     paths = []
-    while True:
-        path = input().strip().replace('"', '')
-        if not path:
-            break
-        paths.append(path)
+    if sys.stdin.isatty():
+        while True:
+            path = input().strip().replace('"', '')
+            if not path:
+                break
+            paths.append(path)
+    else:
+        # 管道输入时按块读取，读到空行为止；剩余内容留给后续的确认提示
+        for line in sys.stdin:
+            path = line.strip().replace('"', '')
+            if not path:
+                break
+            paths.append(path)
     if not paths:
         print("[#process_log]❌ 未输入任何路径")
         return
@@ -454,33 +565,46 @@ def main():
     total_count = len(path_to_artist)
     # init_TextualLogger()
     # 准备参数
-    params = DEFAULT_PARAMS.copy()
+    params = copy.deepcopy({
+        k: dict(v) if isinstance(v, types.MappingProxyType) else v
+        for k, v in DEFAULT_PARAMS.items()
+    })
     
-    for i, (path, artist_folder) in enumerate(path_to_artist.items(), 1):
-        logging.info(f"[#process_log]\n=== 处理第 {i}/{total_count} 个路径 ===")
-        logging.info(f"[#process_log]路径: {path}")
-        logging.info(f"[#process_log]画师文件夹: {artist_folder}")
-        
-        # 更新进度
-        progress = int((i - 1) / total_count * 100)
-        logging.debug(f"[#current_progress]当前进度: [{('=' * int(progress/5))}] {progress}%")
-        logging.info(f"[#current_stats]总路径数: {total_count} 已处理: {i-1} 成功: {success_count} 总进度: [{('=' * int(progress/5))}] {progress}%")
-        
-        # 处理画师文件夹，生成哈希文件
-        hash_file = process_artist_folder(artist_folder, WORKER_COUNT, FORCE_UPDATE)
-        if not hash_file:
-            # 更新失败状态
-            logging.info(f"[#current_stats]总路径数: {total_count} 已处理: {i} 成功: {success_count} 总进度: [{('=' * int(progress/5))}] {progress}%")
-            continue
+    # 多个路径可能对应同一个画师文件夹，按画师文件夹分组，保证每个文件夹只生成一次哈希文件
+    artist_to_paths = {}
+    for path, artist_folder in path_to_artist.items():
+        artist_to_paths.setdefault(artist_folder, []).append(path)
+    
+    processed_count = 0
+    last_emit = 0.0
+    last_pct = -1
+    # 不同画师文件夹之间互不依赖，使用线程池并行处理；WORKER_COUNT 仍作为每个任务内部的线程数
+    with ThreadPoolExecutor(max_workers=min(len(artist_to_paths), os.cpu_count() or 1)) as executor:
+        futures = {}
+        for i, (artist_folder, folder_paths) in enumerate(artist_to_paths.items(), 1):
+            logging.info(f"[#process_log]\n=== 提交第 {i}/{len(artist_to_paths)} 个画师文件夹: {artist_folder} ===")
+            # 每个任务使用独立的参数副本，process_duplicates 可能修改参数，线程间不能共享
+            futures[executor.submit(_one_job, artist_folder, folder_paths, WORKER_COUNT, FORCE_UPDATE, copy.deepcopy(params))] = artist_folder
+        for future in as_completed(futures):
+            artist_folder = futures[future]
+            processed_count += len(artist_to_paths[artist_folder])
+            try:
+                success_count += future.result()
+            except Exception as e:
+                logging.info(f"[#process_log]❌ 处理画师文件夹时出错: {artist_folder}: {e}")
             
-        # 处理重复文件
-        process_duplicates(hash_file, [str(path)], params, WORKER_COUNT)
-        success_count += 1
-        
-        # 更新最终进度
-        progress = int(i / total_count * 100)
-        logging.debug(f"[#current_progress]当前进度: [{('=' * int(progress/5))}] {progress}%")
-        logging.info(f"[#current_stats]总路径数: {total_count}\n已处理: {i}\n成功: {success_count}\n总进度: [{('=' * int(progress/5))}] {progress}%")
+            # 进度更新去抖：百分比变化或距上次超过 0.1 秒才输出，最后一个任务总是输出
+            progress = int(processed_count / total_count * 100)
+            now = time.monotonic()
+            if progress == last_pct and now - last_emit <= 0.1 and processed_count < total_count:
+                continue
+            last_emit = now
+            last_pct = progress
+            # 进度条只构建一次，格式化交给 logging 延迟执行
+            bar = _bar(progress)
+            logging.debug("[#current_progress]当前进度: [%s] %d%%", bar, progress)
+            logging.info("[#current_stats]总路径数: %d\n已处理: %d\n成功: %d\n总进度: [%s] %d%%",
+                         total_count, processed_count, success_count, bar, progress)
             
     logging.info(f"[#update_log]\n✅ 所有处理完成: 成功 {success_count}/{total_count}")
 
@@ -2,62 +2,96 @@ import os
 import sys
 import json
 import argparse
-import subprocess
+import copy
+import functools
+import itertools
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
-import logging
+from typing import Optional, List, Dict, Any, Tuple, Iterator
 from datetime import datetime
 import shutil
-import pyperclip  # 用于复制到剪贴板
+from concurrent.futures import ThreadPoolExecutor
+import errno
 
 # 尝试导入依赖，如果不存在则提供友好的错误信息
 try:
     from loguru import logger
     from rich.console import Console
-    from rich.tree import Tree
-    from rich.panel import Panel
-    from rich import print as rprint
     from rich.prompt import Confirm
+    from rich.style import Style
+    from rich.text import Text
     import typer
-    from rich.json import JSON
 except ImportError as e:
     module_name = str(e).split("'")[1]
     print(f"错误: 缺少必要的依赖 '{module_name}'")
     print("请安装所需依赖: pip install loguru pyperclip rich typer")
     sys.exit(1)
 
+# orjson 为可选依赖，未安装时回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 模块所在目录及默认配置文件路径，进程内不变，只计算一次
+_MODULE_DIR = Path(__file__).resolve().parent
+_DEFAULT_CONFIG_PATH = _MODULE_DIR / "config.json"
+
+# 视为压缩包的文件后缀
+_ARCHIVE_SUFFIXES = frozenset({'.zip', '.7z', '.rar'})
+
+# normalize_path 使用的单字符替换表
+_NORMALIZE_TABLE = str.maketrans({'"': '', "'": '', '\\': '/', '[': '\\[', ']': '\\]'})
+
+# 重命名时表示目标已存在的错误码（POSIX 下非空目录为 ENOTEMPTY，目标为文件时为 ENOTDIR）
+_TARGET_EXISTS_ERRNOS = frozenset({errno.EEXIST, errno.ENOTEMPTY, errno.ENOTDIR})
+
+# 树节点使用的预构建样式，配合 Text 使用可跳过 rich 的标记解析（名称中的[]也不会被误认为标记）
+_STYLE_BLUE = Style(bold=True, color="blue")
+_STYLE_GREEN = Style(bold=True, color="green")
+_STYLE_RED = Style(bold=True, color="red")
+_STYLE_YELLOW = Style(bold=True, color="yellow")
+_STYLE_WHITE = Style(color="white")
+_STYLE_PLAIN_RED = Style(color="red")
+
 # 创建rich控制台
 console = Console()
 
 # 创建typer应用
 app = typer.Typer(help="Kavvka - Czkawka辅助工具，用于处理图片文件夹并生成路径")
 
-def parse_args():
+def parse_args(argv: Optional[List[str]] = None):
     """解析命令行参数
     
+    Args:
+        argv: 要解析的参数列表，为None时使用 sys.argv
+        
     Returns:
         argparse.Namespace: 解析后的参数
     """
-    parser = argparse.ArgumentParser(description='图片过滤工具')
+    # 关闭前缀缩写，避免把 typer 的 --force 之类的选项误认为 --force-update
+    parser = argparse.ArgumentParser(description='图片过滤工具', allow_abbrev=False)
     parser.add_argument('--config', '-c', type=str, help='配置文件路径')
     parser.add_argument('--workers', '-w', type=int, default=2, help='线程数')
     parser.add_argument('--force-update', '-f', action='store_true', help='强制更新哈希值')
-    return parser.parse_args()
+    # 只解析本工具关心的参数，其余参数留给 typer 命令处理
+    args, _ = parser.parse_known_args(argv)
+    return args
 
-def setup_logger(app_name="app", project_root=None, console_output=True):
+def setup_logger(app_name="app", project_root=None, console_output=True, file_output=False):
     """配置 Loguru 日志系统
     
     Args:
         app_name: 应用名称，用于日志目录
         project_root: 项目根目录，默认为当前文件所在目录
         console_output: 是否输出到控制台，默认为True
+        file_output: 是否输出到日志文件，默认为False（仅命令行入口开启）
         
     Returns:
         logger: 配置好的 logger 实例
     """
     # 获取项目根目录
     if project_root is None:
-        project_root = Path(__file__).parent.resolve()
+        project_root = _MODULE_DIR
     
     # 清除默认处理器
     logger.remove()
@@ -70,33 +104,46 @@ def setup_logger(app_name="app", project_root=None, console_output=True):
             format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <blue>{elapsed}</blue> | <level>{level.icon} {level: <8}</level> | <cyan>{name}:{function}:{line}</cyan> - <level>{message}</level>"
         )
     
-    # 使用 datetime 构建日志路径
-    current_time = datetime.now()
-    date_str = current_time.strftime("%Y-%m-%d")
-    hour_str = current_time.strftime("%H")
-    minute_str = current_time.strftime("%M%S")
-    
-    # 构建日志目录和文件路径
-    log_dir = os.path.join(project_root, "logs", app_name, date_str, hour_str)
-    os.makedirs(log_dir, exist_ok=True)
-    log_file = os.path.join(log_dir, f"{minute_str}.log")
-    
-    # 添加文件处理器
-    logger.add(
-        log_file,
-        level="DEBUG",
-        rotation="10 MB",
-        retention="30 days",
-        compression="zip",
-        encoding="utf-8",
-        format="{time:YYYY-MM-DD HH:mm:ss} | {elapsed} | {level.icon} {level: <8} | {name}:{function}:{line} - {message}",
-        enqueue=True,     )
+    # 有条件地添加文件处理器：每个应用只写一个日志文件，由 loguru 负责轮转和清理，
+    # 避免每次运行都新建一个日志文件（loguru 会自动创建缺失的日志目录）
+    if file_output:
+        log_file = f"{project_root}/logs/{app_name}/{app_name}.log"
+        logger.add(
+            log_file,
+            level="DEBUG",
+            rotation="10 MB",
+            retention="30 days",
+            compression="zip",
+            encoding="utf-8",
+            format="{time:YYYY-MM-DD HH:mm:ss} | {elapsed} | {level.icon} {level: <8} | {name}:{function}:{line} - {message}",
+            backtrace=False,
+            diagnose=False,
+            buffering=65536,  # 透传给 open()，批量写入而非逐条落盘；loguru 退出时会自动移除处理器并刷新缓冲区
+        )
     
     logger.info(f"日志系统已初始化，应用名称: {app_name}")
     return logger
 
-# 设置日志
-logger = setup_logger(app_name="kavvka", console_output=True)
+@functools.lru_cache(maxsize=8)
+def _read_config(config_path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """读取并解析配置文件，按解析后的路径、修改时间和大小缓存结果
+    
+    命令行运行时 load_config 只在 _init_runtime 中调用一次，缓存不会命中；
+    缓存仅供在同一进程内多次调用 load_config 的库调用方使用，需要手动清除时调用 _read_config.cache_clear()
+    
+    Args:
+        config_path: 解析后的配置文件路径字符串
+        mtime_ns: 配置文件的修改时间（纳秒），文件被修改后缓存自动失效
+        size: 配置文件大小
+        
+    Returns:
+        Dict[str, Any]: 配置字典（缓存对象，调用方不应直接修改）
+    """
+    if orjson is not None:
+        with open(config_path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
 # 加载配置文件
 def load_config(config_path=None):
@@ -110,14 +157,15 @@ def load_config(config_path=None):
     """
     # 如果未指定配置文件路径，则使用默认路径
     if config_path is None:
-        config_path = Path(__file__).parent / "config.json"
+        config_path = _DEFAULT_CONFIG_PATH
     else:
-        config_path = Path(config_path)
+        config_path = Path(config_path).resolve()
         
     try:
         if config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            # 返回副本，避免调用方修改污染缓存
+            st = os.stat(config_path)
+            config = copy.deepcopy(_read_config(str(config_path), st.st_mtime_ns, st.st_size))
             logger.info(f"✅ 已加载配置文件: {config_path}")
             return config
         else:
@@ -135,23 +183,41 @@ def load_config(config_path=None):
             "force_update": False,
         }
 
-# 解析命令行参数
-args = parse_args()
-
-# 加载配置
-CONFIG = load_config(args.config)
+# 运行时配置，在 _init_runtime() 中填充，避免导入模块时就初始化日志和解析参数
+CONFIG: Dict[str, Any] = {}
+WORKER_COUNT = 2
+FORCE_UPDATE = False
+_RUNTIME_READY = False
+# 命令行交给 typer 解析时置为False，避免 argparse 误读 process -f 等 typer 选项
+_PARSE_CLI_ARGS = True
 
-# 使用命令行参数覆盖配置文件中的设置
-if args.workers is not None:
-    CONFIG["worker_count"] = args.workers
-    logger.info(f"✅ 使用命令行参数设置线程数: {args.workers}")
+def _init_runtime():
+    """初始化日志系统并加载配置（仅在首次调用时生效）"""
+    global CONFIG, WORKER_COUNT, FORCE_UPDATE, _RUNTIME_READY
+    if _RUNTIME_READY:
+        return
+    _RUNTIME_READY = True
     
-if args.force_update:
-    CONFIG["force_update"] = True
-    logger.info(f"✅ 使用命令行参数设置强制更新: {CONFIG['force_update']}")
-
-WORKER_COUNT = CONFIG.get("worker_count", 2)
-FORCE_UPDATE = CONFIG.get("force_update", False)
+    # 设置日志
+    setup_logger(app_name="kavvka", console_output=True, file_output=True)
+    
+    # 解析命令行参数（交给 typer 解析时使用默认值）
+    args = parse_args() if _PARSE_CLI_ARGS else parse_args([])
+    
+    # 加载配置
+    CONFIG = load_config(args.config)
+    
+    # 使用命令行参数覆盖配置文件中的设置
+    if args.workers is not None:
+        CONFIG["worker_count"] = args.workers
+        logger.info(f"✅ 使用命令行参数设置线程数: {args.workers}")
+        
+    if args.force_update:
+        CONFIG["force_update"] = True
+        logger.info(f"✅ 使用命令行参数设置强制更新: {CONFIG['force_update']}")
+    
+    WORKER_COUNT = CONFIG.get("worker_count", 2)
+    FORCE_UPDATE = CONFIG.get("force_update", False)
 
 def normalize_path(path_str):
     """规范化路径字符串，处理转义字符和特殊字符
@@ -162,16 +228,76 @@ def normalize_path(path_str):
     Returns:
         str: 规范化后的路径字符串
     """
-    # 移除引号
-    path_str = path_str.strip().replace('"', '').replace("'", "")
+    # 移除引号、将反斜杠替换为正斜杠（在Windows上也有效）并转义[]，一次遍历完成
+    return path_str.strip().translate(_NORMALIZE_TABLE)
+
+def _is_artist_name(name: str) -> bool:
+    """判断名称是否为画师文件夹（包含成对的[]标记，且[在]之前）"""
+    i = name.find('[')
+    return i != -1 and name.find(']', i + 1) != -1
+
+# 目录扫描缓存：目录路径 -> (目录修改时间, 画师文件夹名称)
+_ARTIST_SCAN_CACHE: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+
+def _scan_artist_children(parent_str: str) -> Tuple[str, ...]:
+    """扫描目录下的画师文件夹名称，按目录缓存结果，目录修改时间变化时重新扫描
+    
+    Args:
+        parent_str: 要扫描的目录路径字符串
+        
+    Returns:
+        Tuple[str, ...]: 画师文件夹名称
+    """
+    # 子项增删或重命名会更新目录的修改时间，未变化时只需一次 stat
+    mtime_ns = os.stat(parent_str).st_mtime_ns
+    cached = _ARTIST_SCAN_CACHE.get(parent_str)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    
+    with os.scandir(parent_str) as it:
+        names = tuple(
+            entry.name for entry in it
+            if _is_artist_name(entry.name) and entry.is_dir(follow_symlinks=False)
+        )
+    _ARTIST_SCAN_CACHE[parent_str] = (mtime_ns, names)
+    return names
+
+def _collect_artist_candidates(base_path: Path) -> List[Path]:
+    """收集基础路径对应的候选画师文件夹（向上查找上级目录并扫描当前目录）
     
-    # 将反斜杠替换为正斜杠（在Windows上也有效）
-    path_str = path_str.replace('\\', '/')
+    Args:
+        base_path: 基础路径（绝对路径）
+        
+    Returns:
+        List[Path]: 去重后的候选画师文件夹，上级目录由近及远在前，当前目录下的子目录在后
+    """
+    candidates = []
+    seen = set()
     
-    # 处理特殊字符的转义
-    path_str = path_str.replace('[', '\\[').replace(']', '\\]')
+    # 向上查找画师文件夹（在路径字符串上逐级截断，命中时才构造路径）
+    base_str = str(base_path)
+    current = base_str
+    while True:
+        idx = current.rfind(os.sep)
+        if idx < 0:
+            break
+        if _is_artist_name(current[idx + 1:]) and current not in seen and os.path.isdir(current):
+            seen.add(current)
+            candidates.append(Path(current))
+        current = current[:idx]
     
-    return path_str
+    # 搜索当前目录下的画师文件夹；输入为普通文件（非压缩包）时没有子目录可扫描，只返回上级目录
+    try:
+        children = _scan_artist_children(base_str)
+    except NotADirectoryError:
+        children = ()
+    for name in children:
+        candidate = os.path.join(base_str, name)
+        if candidate not in seen:
+            seen.add(candidate)
+            candidates.append(Path(candidate))
+    
+    return candidates
 
 def get_artist_folder_from_path(path: Path) -> Optional[Path]:
     """从给定路径获取画师文件夹
@@ -182,48 +308,39 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
     Returns:
         Optional[Path]: 画师文件夹路径
     """
-    def is_artist_folder(p: Path) -> bool:
-        """判断是否为画师文件夹"""
-        return '[' in p.name and ']' in p.name
-    
     try:
-        path = Path(path).resolve()
+        # abspath 只做字符串处理，不像 resolve() 那样逐级解析符号链接
+        path = Path(os.path.abspath(path))
         
         # 如果是压缩包，使用其所在目录
-        if path.is_file() and path.suffix.lower() in ['.zip', '.7z', '.rar']:
+        if path.is_file() and path.suffix.lower() in _ARCHIVE_SUFFIXES:
             base_path = path.parent
         else:
             base_path = path
             
-        # 向上查找画师文件夹
-        current_path = base_path
-        while current_path != current_path.parent:
-            if is_artist_folder(current_path):
-                if current_path.exists():
-                    logger.info(f'✅ 找到画师文件夹: {current_path}')
-                    confirm = input('是否使用该画师文件夹？(Y/n/输入新路径): ').strip()
-                    if not confirm or confirm.lower() == 'y':
-                        return current_path
-                    elif confirm.lower() == 'n':
-                        break  # 继续搜索当前目录下的其他画师文件夹
-                    elif os.path.exists(confirm):
-                        new_path = Path(confirm)
-                        if is_artist_folder(new_path):
-                            return new_path
-                        else:
-                            logger.info('❌ 输入的路径不是画师文件夹（需要包含[]标记）')
-                            break
-                    else:
-                        logger.info('❌ 输入的路径不存在')
-                        break
-            current_path = current_path.parent
-        
-        # 如果向上查找没有找到或用户拒绝了，则搜索当前目录下的画师文件夹
-        artist_folders = []
-        for entry in base_path.iterdir():
-            if entry.is_dir() and is_artist_folder(entry):
-                artist_folders.append(entry)
-                    
+        # 一次性收集候选画师文件夹：直接位于当前目录下的为子目录，其余为上级目录
+        candidates = _collect_artist_candidates(base_path)
+        artist_folders = [folder for folder in candidates if folder.parent == base_path]
+        ancestors = [folder for folder in candidates if folder.parent != base_path]
+        
+        # 优先询问最近的上级画师文件夹
+        if ancestors:
+            current_path = ancestors[0]
+            logger.info(f'✅ 找到画师文件夹: {current_path}')
+            confirm = input('是否使用该画师文件夹？(Y/n/输入新路径): ').strip()
+            if not confirm or confirm.lower() == 'y':
+                return current_path
+            elif confirm.lower() == 'n':
+                pass  # 继续从当前目录下的其他画师文件夹中选择
+            elif os.path.exists(confirm):
+                new_path = Path(confirm)
+                if _is_artist_name(new_path.name):
+                    return new_path
+                logger.info('❌ 输入的路径不是画师文件夹（需要包含[]标记）')
+            else:
+                logger.info('❌ 输入的路径不存在')
+        
+        # 如果向上查找没有找到或用户拒绝了，则从当前目录下的画师文件夹中选择
         if not artist_folders:
             logger.info(f'❌ 在路径 {base_path} 下未找到画师文件夹')
             return None
@@ -237,7 +354,7 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
                 return None
             elif os.path.exists(confirm):
                 new_path = Path(confirm)
-                if is_artist_folder(new_path):
+                if _is_artist_name(new_path.name):
                     return new_path
                 else:
                     logger.info('❌ 输入的路径不是画师文件夹（需要包含[]标记）')
@@ -246,9 +363,14 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
                 logger.info('❌ 输入的路径不存在')
                 return None
             
-        logger.info("\n找到以下画师文件夹:")
+        # 构建一次列表树后整体输出，不再逐条写日志
+        from rich.markup import escape
+        from rich.tree import Tree
+        folders_tree = Tree("[bold cyan]找到以下画师文件夹:[/bold cyan]")
         for i, folder in enumerate(artist_folders, 1):
-            logger.info(f"{i}. {folder}")
+            folders_tree.add(f"{i}. {escape(str(folder))}")
+        console.print(folders_tree)
+        logger.info(f"找到 {len(artist_folders)} 个画师文件夹")
             
         # 让用户选择或输入新路径
         while True:
@@ -261,7 +383,7 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
             # 如果输入的是路径
             if os.path.exists(choice):
                 new_path = Path(choice)
-                if is_artist_folder(new_path):
+                if _is_artist_name(new_path.name):
                     return new_path
                 else:
                     logger.info('❌ 输入的路径不是画师文件夹（需要包含[]标记）')
@@ -280,7 +402,7 @@ def get_artist_folder_from_path(path: Path) -> Optional[Path]:
                         continue
                     elif os.path.exists(confirm):
                         new_path = Path(confirm)
-                        if is_artist_folder(new_path):
+                        if _is_artist_name(new_path.name):
                             return new_path
                         else:
                             logger.info('❌ 输入的路径不是画师文件夹（需要包含[]标记）')
@@ -310,6 +432,42 @@ def create_compare_folder(base_path: Path) -> Path:
     console.print(f"[green]✅ 创建比较文件夹:[/green] [cyan]{compare_folder}[/cyan]")
     return compare_folder
 
+def _move_folder(src: Path, dst: Path):
+    """移动文件夹，优先直接重命名，跨设备时回退到 shutil.move
+    
+    Args:
+        src: 源文件夹路径
+        dst: 目标路径
+        
+    Raises:
+        FileExistsError: 目标路径已存在
+    """
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno in _TARGET_EXISTS_ERRNOS:
+            raise FileExistsError(e.errno, e.strerror, str(dst)) from e
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(os.fspath(src), os.fspath(dst))
+
+def _unique_target(folder: Path, name: str, timestamp: str, counter: Iterator[int]) -> Path:
+    """计算移动目标路径，如果目标路径已存在，添加时间戳和序号后缀
+    
+    Args:
+        folder: 目标所在文件夹
+        name: 文件夹名称
+        timestamp: 本次移动操作共用的时间戳
+        counter: 本次移动操作共用的序号计数器，保证同一秒内的后缀不重复
+        
+    Returns:
+        Path: 目标路径
+    """
+    target_path = folder / name
+    if not os.path.lexists(target_path):
+        return target_path
+    return folder / f"{name}_{timestamp}_{next(counter)}"
+
 def move_folders_to_compare(folders_to_move: List[Path], artist_folder: Path, compare_folder: Path, force: bool = False) -> Dict[str, Any]:
     """将指定的文件夹移动到#compare文件夹
     
@@ -340,22 +498,22 @@ def move_folders_to_compare(folders_to_move: List[Path], artist_folder: Path, co
         result_data["message"] = "没有需要移动的文件夹"
         return result_data
     
-    # 创建文件夹树结构
-    tree = Tree(f"[bold blue]{artist_folder}[/bold blue]")
-    artist_node = tree.add(f"[bold green]{artist_folder.name}[/bold green] (画师文件夹)")
+    # 创建文件夹树结构（按需导入，避免拖慢启动）
+    from rich.tree import Tree
+    tree = Tree(Text(str(artist_folder), style=_STYLE_BLUE))
+    artist_node = tree.add(Text.assemble((artist_folder.name, _STYLE_GREEN), " (画师文件夹)"))
     compare_node = tree.add(f"[bold cyan]#compare[/bold cyan] (比较文件夹)")
     
-    # 添加到树结构中
+    # 计算每个文件夹的目标路径并添加到树结构中，移动时直接复用
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    counter = itertools.count(1)
+    planned_moves = []
     for entry in folders_to_move:
-        target_path = compare_folder / entry.name
+        target_path = _unique_target(compare_folder, entry.name, timestamp, counter)
+        planned_moves.append((entry, target_path))
         
-        # 如果目标路径已存在，添加时间戳后缀
-        if target_path.exists():
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            target_path = compare_folder / f"{entry.name}_{timestamp}"
-        
-        folder_node = tree.add(f"[bold red]{entry.name}[/bold red] (将移动到 #compare)")
-        compare_node.add(f"[bold yellow]{target_path.name}[/bold yellow] (移动后)")
+        folder_node = tree.add(Text.assemble((entry.name, _STYLE_RED), " (将移动到 #compare)"))
+        compare_node.add(Text.assemble((target_path.name, _STYLE_YELLOW), " (移动后)"))
     
     # 显示树结构
     console.print("\n将执行以下文件夹移动操作:")
@@ -369,19 +527,22 @@ def move_folders_to_compare(folders_to_move: List[Path], artist_folder: Path, co
         result_data["message"] = "用户取消移动操作"
         return result_data
     
-    # 执行移动操作
-    for entry in folders_to_move:
+    def move_one(entry: Path, target_path: Path) -> Path:
+        # 移动文件夹，如果确认期间目标路径被占用，重新计算目标路径后重试
         try:
-            target_path = compare_folder / entry.name
-            
-            # 如果目标路径已存在，添加时间戳后缀
-            if target_path.exists():
-                timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                target_path = compare_folder / f"{entry.name}_{timestamp}"
-            
-            # 移动文件夹
-            shutil.move(str(entry), str(target_path))
-            logger.info(f"✅ 已移动文件夹: {entry} -> {target_path}")
+            _move_folder(entry, target_path)
+        except FileExistsError:
+            target_path = _unique_target(compare_folder, entry.name, timestamp, counter)
+            _move_folder(entry, target_path)
+        return target_path
+    
+    # 执行移动操作：跨设备时会回退为复制，使用线程池并发等待IO；按计划顺序收集结果，保证输出稳定
+    with ThreadPoolExecutor(max_workers=min(32, len(planned_moves), (os.cpu_count() or 1) * 4)) as executor:
+        futures = [(entry, executor.submit(move_one, entry, target_path)) for entry, target_path in planned_moves]
+    
+    for entry, future in futures:
+        try:
+            target_path = future.result()
             moved_folders.append(target_path)
             
             # 添加到结果数据中
@@ -398,6 +559,10 @@ def move_folders_to_compare(folders_to_move: List[Path], artist_folder: Path, co
                 "error": str(e)
             })
     
+    # 汇总输出一次移动结果，逐条明细保存在 result_data["moved_folders"] 中
+    if moved_folders:
+        logger.info(f"✅ 已移动 {len(moved_folders)} 个文件夹: {', '.join(p.name for p in moved_folders)}")
+    
     result_data["success"] = len(moved_folders) > 0
     result_data["message"] = f"成功移动了 {len(moved_folders)} 个文件夹"
     
@@ -412,35 +577,20 @@ def find_artist_folders_for_path(path: Path) -> List[Path]:
     Returns:
         List[Path]: 可能的画师文件夹列表
     """
-    def is_artist_folder(p: Path) -> bool:
-        """判断是否为画师文件夹"""
-        return '[' in p.name and ']' in p.name
-    
     try:
-        path = Path(path).resolve()
-        artist_folders = []
+        # abspath 只做字符串处理，不像 resolve() 那样逐级解析符号链接
+        path = Path(os.path.abspath(path))
         
         # 如果是压缩包，使用其所在目录
-        if path.is_file() and path.suffix.lower() in ['.zip', '.7z', '.rar']:
+        if path.is_file() and path.suffix.lower() in _ARCHIVE_SUFFIXES:
             base_path = path.parent
         else:
             base_path = path
             
-        # 向上查找画师文件夹
-        current_path = base_path
-        while current_path != current_path.parent:
-            if is_artist_folder(current_path) and current_path.exists():
-                artist_folders.append(current_path)
-            current_path = current_path.parent
-        
-        # 搜索当前目录下的画师文件夹
-        for entry in base_path.iterdir():
-            if entry.is_dir() and is_artist_folder(entry):
-                artist_folders.append(entry)
-                
-        return artist_folders
+        return _collect_artist_candidates(base_path)
         
-    except Exception as e:
+    except OSError as e:
+        # 只处理文件系统错误（路径不存在、无权限等），其他异常属于程序错误，直接抛出
         print(f'❌ 查找画师文件夹时出错: {e}')
         return []
 
@@ -476,40 +626,55 @@ def batch_get_artist_folders(paths: List[str]) -> dict:
         path_obj = Path(path)
         if path_obj.is_dir():
             parent_dir = path_obj.parent
+            self_stat = os.stat(path_obj)
             siblings = []
-            for entry in parent_dir.iterdir():
-                if (entry.is_dir() and 
-                    entry.resolve() != path_obj.resolve() and 
-                    entry.name != "#compare" and 
-                    not (('[' in entry.name) and (']' in entry.name))):
-                    siblings.append(entry)
+            with os.scandir(parent_dir) as it:
+                for entry in it:
+                    # 先做名称判断（纯字符串操作），再检查是否为目录
+                    if (entry.name != "#compare" and 
+                        not _is_artist_name(entry.name) and 
+                        entry.is_dir(follow_symlinks=False)):
+                        # 名称不同必然不是自身，仅在同名时才比较设备号和 inode
+                        # （Windows 下 DirEntry.stat() 不提供 inode，因此使用 os.stat）
+                        if entry.name == path_obj.name and os.path.samestat(os.stat(entry.path), self_stat):
+                            continue
+                        siblings.append(Path(entry.path))
             path_to_siblings[path] = siblings
     
-    # 显示所有路径和对应的画师文件夹
+    # 路径顺序在交互过程中不变，只构建一次，供显示和按序号查找使用
+    paths_order = list(path_to_folders)
+    
+    # 显示所有路径和对应的画师文件夹：树结构只构建一次，选择变化时只更新相关节点的标签
+    from rich.tree import Tree
+    path_trees = []
+    sel_nodes = {}  # 路径 -> "当前选择"节点
+    folder_nodes = {}  # 路径 -> 可选画师文件夹节点列表
+    for i, path in enumerate(paths_order, 1):
+        # 创建每个路径的树结构
+        path_tree = Tree(Text(f"{i}. 路径: {path}", style=_STYLE_BLUE))
+        
+        # 添加当前选择的画师文件夹（绿色高亮）
+        current_folder = path_to_selected[path]
+        sel_nodes[path] = path_tree.add(Text(f"当前选择: {current_folder}", style=_STYLE_GREEN))
+        
+        # 添加可选的画师文件夹
+        folders_node = path_tree.add("[bold yellow]可选的画师文件夹:[/bold yellow]")
+        folder_nodes[path] = []
+        for j, folder in enumerate(path_to_folders[path], 1):
+            style = _STYLE_GREEN if folder == current_folder else _STYLE_WHITE
+            folder_nodes[path].append(folders_node.add(Text(f"{j}. {folder}", style=style)))
+        
+        # 添加同级文件夹
+        if path in path_to_siblings and path_to_siblings[path]:
+            siblings_node = path_tree.add("[bold magenta]同级文件夹 (将被移动):[/bold magenta]")
+            for sibling in path_to_siblings[path]:
+                siblings_node.add(Text(sibling.name, style=_STYLE_PLAIN_RED))
+        
+        path_trees.append(path_tree)
+    
     while True:
         console.print("\n[bold cyan]当前所有路径及其对应的画师文件夹:[/bold cyan]")
-        
-        for i, path in enumerate(path_to_folders.keys(), 1):
-            # 创建每个路径的树结构
-            path_tree = Tree(f"[bold blue]{i}. 路径: {path}[/bold blue]")
-            
-            # 添加当前选择的画师文件夹（绿色高亮）
-            current_folder = path_to_selected[path]
-            path_tree.add(f"[bold green]当前选择: {current_folder}[/bold green]")
-            
-            # 添加可选的画师文件夹
-            folders_node = path_tree.add("[bold yellow]可选的画师文件夹:[/bold yellow]")
-            for j, folder in enumerate(path_to_folders[path], 1):
-                style = "bold green" if folder == current_folder else "white"
-                folders_node.add(f"[{style}]{j}. {folder}[/{style}]")
-            
-            # 添加同级文件夹
-            if path in path_to_siblings and path_to_siblings[path]:
-                siblings_node = path_tree.add("[bold magenta]同级文件夹 (将被移动):[/bold magenta]")
-                for sibling in path_to_siblings[path]:
-                    siblings_node.add(f"[red]{sibling.name}[/red]")
-                
-            # 显示树
+        for path_tree in path_trees:
             console.print(path_tree)
         
         # 让用户选择是否需要修改
@@ -518,7 +683,11 @@ def batch_get_artist_folders(paths: List[str]) -> dict:
         console.print("- 直接回车确认所有选择")
         console.print("- 输入 [bold red]q[/bold red] 退出")
         
-        choice = input("\n请输入选择: ").strip()
+        try:
+            choice = input("\n请输入选择: ").strip()
+        except EOFError:
+            # 管道输入已读完时按直接回车处理
+            choice = ""
         
         if not choice:
             break
@@ -527,11 +696,18 @@ def batch_get_artist_folders(paths: List[str]) -> dict:
             
         try:
             path_idx, folder_idx = map(int, choice.split())
-            if 1 <= path_idx <= len(paths):
-                path = list(path_to_folders.keys())[path_idx - 1]
+            if 1 <= path_idx <= len(paths_order):
+                path = paths_order[path_idx - 1]
                 folders = path_to_folders[path]
                 if 1 <= folder_idx <= len(folders):
+                    old_idx = folders.index(path_to_selected[path])
                     path_to_selected[path] = folders[folder_idx - 1]
+                    # 只更新变化的节点标签
+                    old_folder = folders[old_idx]
+                    new_folder = folders[folder_idx - 1]
+                    sel_nodes[path].label = Text(f"当前选择: {new_folder}", style=_STYLE_GREEN)
+                    folder_nodes[path][old_idx].label = Text(f"{old_idx + 1}. {old_folder}", style=_STYLE_WHITE)
+                    folder_nodes[path][folder_idx - 1].label = Text(f"{folder_idx}. {new_folder}", style=_STYLE_GREEN)
                     logger.info(f"✅ 已更新: {path} -> {folders[folder_idx - 1]}")
                 else:
                     console.print("[bold red]❌ 无效的画师文件夹序号[/bold red]")
@@ -559,8 +735,8 @@ def generate_czkawka_paths(input_folder: Path, compare_folder: Path) -> Dict[str
         Dict[str, Any]: 包含路径信息的JSON格式数据
     """
     # 确保路径字符串不包含转义字符问题
-    input_path = str(input_folder).replace('\\', '/')
-    compare_path = str(compare_folder).replace('\\', '/')
+    input_path = input_folder.as_posix()
+    compare_path = compare_folder.as_posix()
     paths_str = f"{input_path};{compare_path}"
     
     return {
@@ -569,25 +745,30 @@ def generate_czkawka_paths(input_folder: Path, compare_folder: Path) -> Dict[str
         "combined_path": paths_str
     }
 
-def display_path_panel(paths_data: Dict[str, Any]):
+def display_path_panel(paths_data: Dict[str, Any], copy_to_clipboard: bool = True):
     """在终端显示路径面板，并复制到剪贴板
     
     Args:
         paths_data: 包含路径信息的JSON格式数据
+        copy_to_clipboard: 是否复制到剪贴板，默认为True
     """
     paths_str = paths_data["combined_path"]
     
-    # 复制到剪贴板
-    try:
-        pyperclip.copy(paths_str)
-        logger.info("✅ 路径已复制到剪贴板")
-    except Exception as e:
-        logger.error(f"❌ 复制到剪贴板失败: {e}")
+    # 复制到剪贴板（按需导入 pyperclip，避免拖慢启动）
+    if copy_to_clipboard:
+        try:
+            import pyperclip
+            pyperclip.copy(paths_str)
+            logger.info("✅ 路径已复制到剪贴板")
+        except Exception as e:
+            logger.error(f"❌ 复制到剪贴板失败: {e}")
     
     # 显示路径面板
+    from rich.panel import Panel
+    title = "Czkawka 路径 (已复制到剪贴板)" if copy_to_clipboard else "Czkawka 路径"
     panel = Panel(
         f"[bold white]{paths_str}[/bold white]", 
-        title="[bold green]Czkawka 路径 (已复制到剪贴板)[/bold green]",
+        title=f"[bold green]{title}[/bold green]",
         border_style="cyan",
         expand=False
     )
@@ -597,9 +778,11 @@ def display_path_panel(paths_data: Dict[str, Any]):
 def process(
     paths: List[str] = typer.Argument(None, help="要处理的路径列表"),
     force: bool = typer.Option(False, "--force", "-f", help="强制移动文件夹，不询问确认"),
-    output_json: bool = typer.Option(False, "--json", "-j", help="以JSON格式输出结果")
+    output_json: bool = typer.Option(False, "--json", "-j", help="将结果保存为JSON和toml文件"),
+    no_clipboard: bool = typer.Option(False, "--no-clipboard", help="不复制路径到剪贴板")
 ):
     """处理指定的路径，查找画师文件夹并移动其他文件夹到#compare文件夹"""
+    _init_runtime()
     if not paths:
         console.print("[bold red]❌ 未提供任何路径[/bold red]")
         return
@@ -663,7 +846,7 @@ def process(
         # 生成czkawka路径字符串并显示（使用输入路径而不是画师文件夹）
         paths_data = generate_czkawka_paths(Path(path), compare_folder)
         path_result["czkawka_paths"] = paths_data
-        display_path_panel(paths_data)
+        display_path_panel(paths_data, copy_to_clipboard=not no_clipboard)
         
         # 收集combined_path
         all_results["all_combined_paths"].append(paths_data["combined_path"])
@@ -685,8 +868,9 @@ def process(
     # 输出总结
     console.print(f"\n[bold green]✅ 所有处理完成: 成功 {success_count}/{total_count}[/bold green]")
     
-    # 如果需要，输出完整的JSON结果
-    if output_json or True:  # 默认总是输出JSON
+    # 如果需要，将完整的JSON结果保存到文件
+    json_file = None
+    if output_json:
         # console.print("\n[bold cyan]完整处理结果 (JSON):[/bold cyan]")
         # console.print(JSON.from_data(all_results))
         
@@ -699,60 +883,65 @@ def process(
         else:
             json_file = Path(f"kavvka_result_{timestamp}.json")
             
-        with open(json_file, "w", encoding="utf-8") as f:
-            json.dump(all_results, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            with open(json_file, "wb") as f:
+                f.write(orjson.dumps(all_results, option=orjson.OPT_INDENT_2))
+        else:
+            with open(json_file, "w", encoding="utf-8") as f:
+                json.dump(all_results, f, ensure_ascii=False, indent=2)
         console.print(f"[green]✅ 结果已保存到文件: {json_file}[/green]")
         
-        # 生成并显示所有combined_path的合并结果
-        if all_results["all_combined_paths"]:
-            # 使用三引号格式化输出，每行一个路径
-            all_paths = "\n".join(all_results["all_combined_paths"])
-            
-            console.print("\n[bold cyan]所有Czkawka路径合集:[/bold cyan]")
-            console.print("[bold green]===== 复制以下内容 =====[/bold green]")
-            print(all_paths)  # 直接使用print，不带任何格式化，便于复制
-            console.print("[bold green]======================[/bold green]")
-            
-            # 复制所有路径到剪贴板
+    # 生成并显示所有combined_path的合并结果
+    if all_results["all_combined_paths"]:
+        # 使用三引号格式化输出，每行一个路径
+        all_paths = "\n".join(all_results["all_combined_paths"])
+        
+        console.print("\n[bold cyan]所有Czkawka路径合集:[/bold cyan]")
+        console.print("[bold green]===== 复制以下内容 =====[/bold green]")
+        print(all_paths)  # 直接使用print，不带任何格式化，便于复制
+        console.print("[bold green]======================[/bold green]")
+        
+        # 复制所有路径到剪贴板
+        if not no_clipboard:
             try:
+                import pyperclip
                 pyperclip.copy(all_paths)
                 console.print("[green]✅ 所有路径已复制到剪贴板[/green]")
             except Exception as e:
                 logger.error(f"❌ 复制到剪贴板失败: {e}")
 
-            # 新增：保存一份 toml 文件，使用三引号保存所有路径
-            try:
-                import toml
-            except ImportError:
-                console.print("[yellow]未安装 toml，正在尝试安装...[/yellow]")
-                subprocess.run([sys.executable, '-m', 'pip', 'install', 'toml'])
-                import toml
-            
-            # 生成单个路径集合（按分号拆分）
-            single_paths = []
-            for combined_path in all_results["all_combined_paths"]:
-                # 按分号拆分每个合并路径
-                paths_in_combined = combined_path.split(';')
-                single_paths.extend(paths_in_combined)
-            
-            single_paths_str = "\n".join(single_paths)
-            
-            # 保存到同一个 toml 文件，包含三个字段
+        # 新增：与JSON结果一起保存一份 toml 文件，使用三引号保存所有路径（只有三个字符串字段，直接写入，无需 toml 库）
+        if json_file is not None:
+            # 保存到同一个 toml 文件，包含三个字段；单个路径（按分号拆分）边拆分边写入，不再构建中间列表
+            combined_paths = all_results["all_combined_paths"]
             toml_file = str(json_file).replace('.json', '.toml')
-            single_paths_joined = ";".join(single_paths)
             with open(toml_file, 'w', encoding='utf-8') as f:
                 f.write(f'all_combined_paths = """\n{all_paths}\n"""\n\n')
-                f.write(f'single_paths = """\n{single_paths_str}\n"""\n\n')
-                f.write(f'single_paths_joined = """\n{single_paths_joined}\n"""\n')
+                
+                f.write('single_paths = """\n')
+                for combined_path in combined_paths:
+                    for single_path in combined_path.split(';'):
+                        f.write(single_path)
+                        f.write('\n')
+                f.write('"""\n\n')
+                
+                f.write('single_paths_joined = """\n')
+                for j, combined_path in enumerate(combined_paths):
+                    if j:
+                        f.write(';')
+                    f.write(combined_path)
+                f.write('\n"""\n')
             console.print(f"[green]✅ 路径合集已保存为 toml 文件: {toml_file}[/green]")
     
     return all_results
 
-@app.command()
+@app.command("interactive")
 def main(
     output_json: bool = typer.Option(False, "--json", "-j", help="以JSON格式输出结果")
 ):
     """交互式处理路径，查找画师文件夹并移动其他文件夹到#compare文件夹"""
+    _init_runtime()
+    
     # 显示欢迎信息
     console.print("\n[bold green]欢迎使用 Kavvka - Czkawka 辅助工具[/bold green]")
     console.print("[cyan]用于处理图片文件夹并生成路径[/cyan]\n")
@@ -760,18 +949,43 @@ def main(
     # 获取路径列表
     console.print("[bold yellow]请输入要处理的路径（每行一个，输入空行结束）:[/bold yellow]")
     paths = []
-    while True:
-        path = input().strip().replace('"', '')
-        if not path:
-            break
-        paths.append(path)
+    if sys.stdin.isatty():
+        while True:
+            path = input().strip().strip('"')
+            if not path:
+                break
+            paths.append(path)
+    else:
+        # 管道输入时按块读取，读到空行为止；剩余内容留给后续的确认提示
+        for line in sys.stdin:
+            path = line.strip().strip('"')
+            if not path:
+                break
+            paths.append(path)
     if not paths:
         console.print("[bold red]❌ 未输入任何路径[/bold red]")
         return
         
     # 调用处理函数
-    return process(paths, output_json=output_json)
+    return process(paths, output_json=output_json, no_clipboard=False)
+
+# 命令行以这些参数开头时交给 typer 解析
+_TYPER_ARGS = frozenset({"process", "interactive", "--help"})
+
+def run():
+    """命令行入口
+    
+    以子命令或 --help 开头时交给 typer 解析，使 --json、--no-clipboard 等选项生效；
+    其余情况（无参数或仅有 --workers 等全局参数）直接进入交互模式
+    """
+    global _PARSE_CLI_ARGS
+    if len(sys.argv) > 1 and sys.argv[1] in _TYPER_ARGS:
+        _PARSE_CLI_ARGS = False
+        app()
+    else:
+        # 直接调用时 typer 不会解析参数，需显式传入选项值
+        main(output_json=False)
 
 # 入口点
 if __name__ == "__main__":
-    main()
+    run()